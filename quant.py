@@ -1,15 +1,44 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
+matplotlib.use("Agg")  # Headless raster backend; no GUI toolkit is ever needed
+# Fixed plot defaults, set once at import: a single known font keeps font lookups cheap,
+# and path simplification thins out dense scatter paths
+matplotlib.rcParams.update({
+    'font.family': 'DejaVu Sans',
+    'font.size': 10,
+    'axes.spines.top': False,
+    'axes.spines.right': False,
+    'pdf.fonttype': 42,
+    'path.simplify': True,
+    'path.simplify_threshold': 1.0,
+    'agg.path.chunksize': 10000,
+})
+from matplotlib.figure import Figure
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Flowable, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from PIL import Image as PILImage
 from reportlab.lib import colors
 import io
+import os
 import math
-import base64
+import threading
 from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from multiprocessing import shared_memory
+
+try:
+    import numba
+    from numba import njit, prange
+    # Streamlit runs scripts off the main thread, and after parallel launches from such a thread
+    # the TBB layer hangs interpreter exit; OpenMP and workqueue (always available) do not
+    numba.config.THREADING_LAYER_PRIORITY = ['omp', 'workqueue', 'tbb']
+except ImportError:  # Numba is optional; compute_correlations falls back to NumPy without it
+    njit = None
 
 # Set page configuration
 st.set_page_config(
@@ -53,177 +82,454 @@ st.markdown("""
 
 # --- CORE ANALYSIS FUNCTIONS (Unchanged) ---
 
-def generate_plot(df, x_col, y_col, r_value):
-    """Generates a scatter plot and returns the path to the saved image."""
-    chart_filename = f'plot_{x_col}_vs_{y_col}.png'
+# Scatter plots draw at most this many points; r is always computed on the full data
+PLOT_SAMPLE_SIZE = 5_000
+
+# Common ID column names (lowercased); these correlate spuriously and are never used as X features
+ID_COLUMNS = frozenset({'id', 'observationid', 'rowid', 'index'})
+
+# --- INTERPRETATION TEMPLATES ---
+# Indexed by strength bucket: (|r| >= 0.7) + (|r| >= 0.3)
+STRENGTH = ("weak or negligible", "moderate", "strong")
+LINE_TMPL = (
+    "The fit is poor, explaining only {r_sq:.1%} of the variance. The data suggests a non-linear relationship, no significant relationship, or that the feature is a poor predictor.",
+    "This relationship shows moderate linearity, accounting for {r_sq:.1%} (R²) of the variance in {y_col}. Other non-linear or external factors likely play a significant role.",
+    "This relationship is highly linear, with the X-feature explaining {r_sq:.1%} (R²) of the variance in {y_col}.",
+)
+
+# Indexed by sign(r) + 1
+DIRECTION = ("negative (decreasing)", "no discernable linear", "positive (increasing)")
+DIRECTION_TMPL = (
+    "This means that as {x_col} increases, {y_col} tends to decrease.",
+    "There is no clear linear tendency in the data.",
+    "This means that as {x_col} increases, {y_col} also tends to increase.",
+)
+
+# Full interpretation text for every (strength, direction) pair, so each feature formats exactly one string
+INTERPRETATION_TMPL = tuple(
+    tuple(
+        f"The analysis revealed {strength} {direction} linear relationship (r = {{r:.4f}}) between {{x_col}} and {{y_col}}. {direction_phrase} {linearity}"
+        for direction, direction_phrase in zip(DIRECTION, DIRECTION_TMPL)
+    )
+    for strength, linearity in zip(STRENGTH, LINE_TMPL)
+)
+
+def build_numeric_array(df, numeric_cols):
+    """
+    Copies the numeric columns into one array and flags the columns with usable spread.
+    Returns (arr, stds, valid); the same mask drives feature selection and the correlations.
+    """
+    # Column-major layout: every feature is one contiguous block. Kept in float64, since float32
+    # cannot hold large-magnitude columns (e.g. timestamps) precisely enough to center them
+    arr = np.asfortranarray(df[numeric_cols].to_numpy(dtype=np.float64))
+    stds = arr.std(axis=0, ddof=0)
     
-    plt.figure(figsize=(8, 5))
-    plt.scatter(df[x_col], df[y_col], alpha=0.5, color='darkred')
-    plt.title(f'Scatter Plot: {x_col} vs. {y_col} (r = {r_value})', fontsize=14)
-    plt.xlabel(x_col, fontsize=12)
-    plt.ylabel(y_col, fontsize=12)
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.tight_layout()
+    # Constant columns (zero variance) have no defined correlation
+    valid = stds > 1e-6
+    return arr, stds, valid
+
+def select_x_features(numeric_cols, valid, y_feature):
+    """Returns the numeric columns usable as X features: not Y, not an ID column, and not constant."""
+    id_mask = np.array([col.lower() in ID_COLUMNS for col in numeric_cols], dtype=bool)
+    valid = (
+        valid                                      # drop constant columns (zero variance)
+        & ~id_mask                                 # drop common ID columns (spurious correlation)
+        & (np.array(numeric_cols) != y_feature)
+    )
+    return [numeric_cols[i] for i in np.flatnonzero(valid)]
+
+if njit is not None:
+    # Columns are independent (each iteration writes only r_all[k]), so they run across threads.
+    # The report's process pool spawns rather than forks, so the live Numba thread pool is safe
+    @njit(fastmath=True, cache=True, parallel=True)
+    def _pearson_all(arr, valid, y_index):
+        """Fused single-pass Pearson r of every column against column y_index (sum, sum of squares, cross products)."""
+        n_rows, n_cols = arr.shape
+        r_all = np.full(n_cols, np.nan)
+        if n_rows == 0 or not valid[y_index]:
+            return r_all
+        
+        # Values are shifted by the first row to limit cancellation in the raw-moment formulas
+        y = arr[:, y_index]
+        y0 = y[0]
+        sy = 0.0
+        syy = 0.0
+        for i in range(n_rows):
+            w = y[i] - y0
+            sy += w
+            syy += w * w
+        var_y = syy - sy * sy / n_rows
+        
+        # The column-major layout makes every column sweep a contiguous stream
+        for k in prange(n_cols):
+            x0 = arr[0, k]
+            sx = 0.0
+            sxx = 0.0
+            sxy = 0.0
+            for i in range(n_rows):
+                v = arr[i, k] - x0
+                sx += v
+                sxx += v * v
+                sxy += v * (y[i] - y0)
+            var_x = sxx - sx * sx / n_rows
+            
+            # Constant columns (see build_numeric_array) stay NaN
+            if valid[k]:
+                r = (sxy - sx * sy / n_rows) / np.sqrt(var_x * var_y)
+                r_all[k] = min(max(r, -1.0), 1.0)
+        
+        return r_all
+else:
+    _pearson_all = None
+
+_PEARSON_LOCK = threading.Lock()
+
+def compute_correlations(arr, stds, valid, y_index):
+    """
+    Correlates every numeric column with Y in one go: a fused single-pass Numba kernel when
+    Numba is installed, otherwise standardized columns and a single matrix-vector product.
+    Columns outside the valid mask get r = NaN.
+    """
+    if _pearson_all is not None:
+        # Sessions run in their own threads, and Numba's fallback "workqueue" threading layer
+        # aborts on concurrent launches, so one kernel call runs at a time
+        with _PEARSON_LOCK:
+            return _pearson_all(arr, valid, y_index)
+    
+    n_rows = arr.shape[0]
+    r_all = np.full(arr.shape[1], np.nan)
     
-    plt.savefig(chart_filename)
-    plt.close()
-    return chart_filename
+    # Drop constant columns before standardizing
+    if valid[y_index]:
+        kept = arr[:, valid]
+        z = np.nan_to_num((kept - kept.mean(axis=0)) / stds[valid])
+        z_y = z[:, np.count_nonzero(valid[:y_index])]
+        r_all[valid] = np.clip((z.T @ z_y) / n_rows, -1.0, 1.0)
+    
+    return r_all
 
-def perform_analysis(df, x_col, y_col):
+@st.cache_data(max_entries=4, show_spinner=False)
+def compute_correlation_matrix(arr, stds, valid):
+    """
+    Pearson correlation of every numeric column with every other: the standardized columns
+    go through one matrix product (C = Z.T @ Z / N). Constant columns get NaN rows and columns.
+    Memoized, since the expander is rebuilt on every widget interaction.
+    """
+    n_rows, n_cols = arr.shape
+    corr = np.full((n_cols, n_cols), np.nan)
+    if n_rows == 0 or not valid.any():
+        return corr
+    
+    kept = arr[:, valid]
+    z = (kept - kept.mean(axis=0)) / stds[valid]
+    corr[np.ix_(valid, valid)] = np.clip((z.T @ z) / n_rows, -1.0, 1.0)
+    return corr
+
+@st.cache_resource
+def _plot_canvas():
+    """
+    One reusable figure for every scatter plot (cleared between calls instead of rebuilt).
+    Shared by all sessions, so drawing must hold the returned lock.
+    """
+    fig = Figure(figsize=(8, 5))
+    return fig, fig.subplots(), threading.Lock()
+
+def _plot_png(x_values, y_values, x_col, y_col, r_value):
+    """Renders the scatter plot to PNG bytes on the shared canvas."""
+    title = f'Scatter Plot: {x_col} vs. {y_col} (r = {r_value:.4f})'
+    
+    # Large datasets: plot a fixed random subset (same rows for every feature) to keep rendering cheap
+    if len(x_values) > PLOT_SAMPLE_SIZE:
+        rng = np.random.default_rng(0)
+        idx = np.sort(rng.choice(len(x_values), PLOT_SAMPLE_SIZE, replace=False))
+        x_values, y_values = x_values[idx], y_values[idx]
+        title += ' (subsampled)'
+    
+    fig, ax, lock = _plot_canvas()
+    plot_buf = BytesIO()
+    
+    # Streamlit runs each session in its own thread; only one of them may draw at a time
+    with lock:
+        ax.cla()
+        ax.scatter(x_values, y_values, alpha=0.5, color='darkred', rasterized=True)
+        ax.set_title(title, fontsize=14)
+        ax.set_xlabel(x_col, fontsize=12)
+        ax.set_ylabel(y_col, fontsize=12)
+        ax.grid(True, linestyle='--', alpha=0.6)
+        fig.tight_layout()
+        fig.savefig(plot_buf, format='png', dpi=90)
+    
+    return plot_buf.getvalue()
+
+def generate_plot(x_values, y_values, x_col, y_col, r_value):
+    """Generates a scatter plot and returns it as an in-memory PNG buffer."""
+    return BytesIO(_plot_png(x_values, y_values, x_col, y_col, r_value))
+
+def perform_analysis(arr, x_index, y_index, r_all, col_names, head_df):
     """Performs correlation, generates plot, and creates enhanced interpretation."""
+    x_col = col_names[x_index]
+    y_col = col_names[y_index]
     
     # 1. Numeric Output: Correlation
-    # Use pandas correlation function
-    correlation_r = df[x_col].corr(df[y_col])
+    # Read the precomputed Pearson coefficient for this feature
+    correlation_r = float(r_all[x_index])
     
-    # 2. Small Table: First 5 rows (pd.head)
-    small_table_df = df[[x_col, y_col]].head(5) 
+    # 2. Small Table: First 5 rows, taken from the original frame so integer columns keep their dtype
+    small_table_df = head_df[[x_col, y_col]]
 
     # 3. Chart/Scatter Plot
-    plot_path = generate_plot(df, x_col, y_col, correlation_r.round(4))
+    plot_buf = generate_plot(arr[:, x_index], arr[:, y_index], x_col, y_col, correlation_r)
     
     # 4. Enhanced Interpretation (Using ReportLab <b> and Unicode for R-squared)
     r_sq = correlation_r**2
     r_abs = abs(correlation_r)
     
-    # --- Strength Evaluation ---
-    if r_abs >= 0.7:
-        strength = "strong"
-        linearity = f"This relationship is highly linear, with the X-feature explaining {r_sq:.1%} (R²) of the variance in {y_col}."
-    elif r_abs >= 0.3:
-        strength = "moderate"
-        linearity = f"This relationship shows moderate linearity, accounting for {r_sq:.1%} (R²) of the variance in {y_col}. Other non-linear or external factors likely play a significant role."
-    else:
-        strength = "weak or negligible"
-        linearity = f"The fit is poor, explaining only {r_sq:.1%} of the variance. The data suggests a non-linear relationship, no significant relationship, or that the feature is a poor predictor."
-        
-    # --- Direction Evaluation ---
-    if correlation_r > 0:
-        direction = "positive (increasing)"
-        direction_phrase = f"This means that as {x_col} increases, {y_col} also tends to increase."
-    elif correlation_r < 0:
-        direction = "negative (decreasing)"
-        direction_phrase = f"This means that as {x_col} increases, {y_col} tends to decrease."
-    else:
-        direction = "no discernable linear"
-        direction_phrase = "There is no clear linear tendency in the data."
+    # --- Strength and Direction Lookup (NaN falls into the weak / no-direction slots) ---
+    bucket = int(r_abs >= 0.7) + int(r_abs >= 0.3)
+    sign = int(correlation_r > 0) - int(correlation_r < 0) + 1
+    strength = STRENGTH[bucket]
+    direction = DIRECTION[sign]
+    
+    interpretation = INTERPRETATION_TMPL[bucket][sign].format(r=correlation_r, r_sq=r_sq, x_col=x_col, y_col=y_col)
+    
+    return small_table_df, correlation_r, plot_buf, interpretation, strength, direction, r_sq
+
+def analyze_feature(arr, x_index, y_index, r_all, col_names, head_df):
+    """Runs perform_analysis for one X feature and packages the outcome as a result record."""
+    x_col = col_names[x_index]
+    try:
+        small_table_df, r_value, plot_buf, interpretation, strength, direction, r_sq = perform_analysis(arr, x_index, y_index, r_all, col_names, head_df)
+    except Exception as e:
+        # Reported per feature in the UI and the PDF instead of aborting the whole run
+        return {'feature': x_col, 'error': str(e)}
+    
+    # PDF table as a list of lists (including header row), from the same head as the on-screen table
+    # Rounding data for cleaner presentation in the table; object cells keep each column's own type
+    # (integers stay exact instead of passing through float64)
+    table_data = [[x_col, col_names[y_index]]] + small_table_df.round(2).astype(object).values.tolist()
+    
+    return {
+        'feature': x_col,
+        'correlation': r_value,
+        'r_squared': r_sq,
+        'strength': strength,
+        'direction': direction,
+        'interpretation': interpretation,
+        'plot_png': plot_buf.getvalue(),
+        'sample_data': small_table_df,
+        'table_data': table_data
+    }
+
+def analyze_features(arr, x_indices, y_index, r_all, col_names, head_df, on_progress=None):
+    """
+    Analyzes every X feature and returns one result record per feature, in order.
+    Small feature sets run serially; large ones are spread over a process pool.
+    on_progress, if given, is called with the completed fraction after each feature.
+    """
+    if len(x_indices) >= PARALLEL_MIN_FEATURES and (os.cpu_count() or 1) > 1:
+        return run_parallel_analysis(arr, x_indices, y_index, r_all, col_names, head_df, on_progress)
+    
+    results = []
+    for i, x_index in enumerate(x_indices):
+        results.append(analyze_feature(arr, x_index, y_index, r_all, col_names, head_df))
+        if on_progress is not None:
+            on_progress((i + 1) / len(x_indices))
+    return results
+
+# --- PARALLEL ANALYSIS WORKERS ---
+
+# Below this many X features, pool start-up costs more than it saves
+PARALLEL_MIN_FEATURES = 16
+
+# Per-process view of the shared numeric array, set up once by _init_worker
+_WORKER_SHM = None
+_WORKER_ARR = None
+
+def _init_worker(shm_name, shape, dtype):
+    """Attaches a pool worker to the shared numeric array instead of unpickling a copy per task."""
+    global _WORKER_SHM, _WORKER_ARR
+    _WORKER_SHM = shared_memory.SharedMemory(name=shm_name)
+    _WORKER_ARR = np.ndarray(shape, dtype=dtype, buffer=_WORKER_SHM.buf, order='F')
+
+def _analyze_one(args):
+    """Analyzes a single X feature inside a pool worker and returns a picklable result record."""
+    return analyze_feature(_WORKER_ARR, *args)
+
+def run_parallel_analysis(arr, x_indices, y_index, r_all, col_names, head_df, on_progress=None):
+    """
+    Analyzes every X feature concurrently in a process pool that shares one copy of the numeric array.
+    Returns the result records in the same order as x_indices.
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    results = []
+    try:
+        shared_arr = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, order='F')
+        shared_arr[:] = arr
+        del shared_arr
         
-    interpretation = (
-        f"The analysis revealed {strength} {direction} linear relationship (r = {correlation_r:.4f}) between {x_col} and {y_col}. "
-        f"{direction_phrase} {linearity}"
-    )
+        # Spawned (not forked) workers: forking the multi-threaded Streamlit server is unsafe
+        max_workers = min(os.cpu_count() or 1, len(x_indices))
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(shm.name, arr.shape, arr.dtype)
+        ) as executor:
+            futures = [executor.submit(_analyze_one, (x_index, y_index, r_all, col_names, head_df)) for x_index in x_indices]
+            
+            for i, (x_index, future) in enumerate(zip(x_indices, futures)):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # e.g. a worker process died; keep the remaining features
+                    results.append({'feature': col_names[x_index], 'error': str(e)})
+                if on_progress is not None:
+                    on_progress((i + 1) / len(x_indices))
+    finally:
+        shm.close()
+        shm.unlink()
     
-    return small_table_df, correlation_r.round(4), plot_path, interpretation, strength, direction, r_sq
+    return results
 
 # --- PDF GENERATION FUNCTION (Unchanged) ---
 
-def generate_report(df, y_feature):
+class DecodedImage(Flowable):
     """
-    Iterates through all suitable columns (X) against the Y feature, performs analysis,
-    and compiles all results into a single PDF report.
+    Fixed-size image flowable drawn from an already decoded ImageReader.
+    (platypus.Image only accepts file names and file objects, and decodes them itself.)
     """
+    def __init__(self, reader, width, height):
+        super().__init__()
+        self.reader = reader
+        self.width = width
+        self.height = height
+        self.hAlign = 'CENTER'
     
-    # --- ROBUST FILTERING ---
-    # Initialization of x_features is critical to avoid the NameError
-    all_numeric_cols = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
-    x_features = [] # <--- THIS IS THE FIX for the NameError
+    def wrap(self, avail_width, avail_height):
+        return self.width, self.height
     
-    for col in all_numeric_cols:
-        if col == y_feature:
-            continue
-            
-        # 1. Filter common ID columns (spurious correlation)
-        if col.lower() in ['id', 'observationid', 'rowid', 'index']:
-            continue
-            
-        # 2. Filter constant columns (zero variance)
-        if df[col].std() < 1e-6:
-             continue
-             
-        x_features.append(col)
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, width=self.width, height=self.height, mask='auto')
+
+def decode_png(png):
+    """Decodes PNG bytes once with PIL and wraps them for ReportLab."""
+    image = PILImage.open(BytesIO(png))
+    image.load()
+    return ImageReader(image)
+
+# Paragraph styles and the sample-table style are built once and shared by every report section
+STYLES = getSampleStyleSheet()
+TITLE_STYLE = STYLES['Title']
+H1_STYLE = STYLES['h1']
+H2_STYLE = STYLES['h2']
+H3_STYLE = STYLES['h3']
+NORMAL_STYLE = STYLES['Normal']
+ITALIC_STYLE = STYLES['Italic']
+
+# Styling for the sample data table, for a professional look
+SAMPLE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+def generate_report(results, y_feature):
+    """
+    Compiles the per-feature result records (see analyze_features) for the Y feature
+    into a single PDF report.
+    """
     
-    if not x_features:
+    if not results:
         st.error(f"No suitable numeric X features found to compare against {y_feature}. Check your CSV.")
         return None
+    
+    return _build_report_bytes(results, y_feature)
+
+def _build_report_bytes(results, y_feature):
+    """Renders the PDF into memory and returns its bytes."""
+    x_features = [result['feature'] for result in results]
 
     # --- PDF Report Setup ---
-    pdf_filename = 'Comprehensive_Scientific_Report.pdf'
-    doc = SimpleDocTemplate(pdf_filename, pagesize=letter)
-    styles = getSampleStyleSheet()
+    # Build straight into memory; the bytes are handed to st.download_button
+    pdf_buf = BytesIO()
+    doc = SimpleDocTemplate(pdf_buf, pagesize=letter)
     story = []
 
     # Title Page/Executive Summary Intro
-    story.append(Paragraph("Comprehensive Scientific Analysis Report", styles['Title']))
+    story.append(Paragraph("Comprehensive Scientific Analysis Report", TITLE_STYLE))
     story.append(Spacer(1, 12))
     # Using <b> for bolding the Y_feature in the title
-    story.append(Paragraph(f"Dependent Variable: <b>{y_feature}</b>", styles['h1']))
+    story.append(Paragraph(f"Dependent Variable: <b>{y_feature}</b>", H1_STYLE))
     story.append(Spacer(1, 24))
     
     # Loop through each valid X feature
-    for x_col in x_features:
+    for fig_num, (x_col, result) in enumerate(zip(x_features, results), start=1):
+        if 'error' in result:
+            story.extend([Paragraph(f"Analysis Failed for {x_col}: {result['error']}", NORMAL_STYLE), Spacer(1, 12)])
+            continue
+        
         try:
-            small_table_df, r_value, plot_path, interpretation, strength, direction, r_sq = perform_analysis(df, x_col, y_feature)
-
-            # --- Add Section Header ---
-            story.append(Paragraph(f"Section: Relationship between {x_col} and {y_feature}", styles['h2']))
-            story.append(Spacer(1, 6))
-
-            # --- Add Interpretation (Requested detailed explanation) ---
-            story.append(Paragraph("Interpretation of Findings (Direction and Linearity):", styles['h3']))
-            story.append(Paragraph(interpretation, styles['Normal']))
-            story.append(Spacer(1, 12))
-            
-            # --- ADD NATIVE REPORTLAB TABLE (FIX for strange appearance) ---
-            story.append(Paragraph("Numeric Output (Sample Data Head):", styles['h3']))
-            
-            # Convert DataFrame to list of lists (including header row)
-            # Rounding data for cleaner presentation in the table
-            table_data = [small_table_df.columns.tolist()] + small_table_df.values.round(2).tolist()
-            
-            # Create the Table object
-            table = Table(table_data)
-            
-            # Apply styling for a professional look
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(table)
-            story.append(Spacer(1, 12))
-
-            # --- Add Chart/Scatter Plot ---
-            story.append(Paragraph(f"Visualization ($r = {r_value}$):", styles['h3']))
-            story.append(Image(plot_path, width=400, height=250))
+            r_value = result['correlation']
             
             # --- NEW: Add a specific explanatory caption below the plot ---
-            caption = f"Figure 1.{x_features.index(x_col) + 1}: Scatter plot illustrating the relationship between {x_col} and {y_feature}. The data points confirm the calculated correlation of $r = {r_value}$."
-            # Using the 'Italic' style for a standard caption look
-            story.append(Paragraph(caption, styles['Italic']))
-            # --- END NEW ---
+            caption = f"Figure 1.{fig_num}: Scatter plot illustrating the relationship between {x_col} and {y_feature}. The data points confirm the calculated correlation of $r = {r_value:.4f}$."
             
-            story.append(Spacer(1, 24))
+            # --- ADD NATIVE REPORTLAB TABLE (FIX for strange appearance) ---
+            table = Table(result['table_data'])
+            table.setStyle(SAMPLE_TABLE_STYLE)
+            
+            # Build the whole section locally, then add it to the story in one go
+            section = [
+                # --- Add Section Header ---
+                Paragraph(f"Section: Relationship between {x_col} and {y_feature}", H2_STYLE),
+                Spacer(1, 6),
+                
+                # --- Add Interpretation (Requested detailed explanation) ---
+                Paragraph("Interpretation of Findings (Direction and Linearity):", H3_STYLE),
+                Paragraph(result['interpretation'], NORMAL_STYLE),
+                Spacer(1, 12),
+                
+                Paragraph("Numeric Output (Sample Data Head):", H3_STYLE),
+                table,
+                Spacer(1, 12),
+                
+                # --- Add Chart/Scatter Plot ---
+                Paragraph(f"Visualization ($r = {r_value:.4f}$):", H3_STYLE),
+                DecodedImage(decode_png(result['plot_png']), width=400, height=250),
+                # Using the 'Italic' style for a standard caption look
+                Paragraph(caption, ITALIC_STYLE),
+                Spacer(1, 24),
+            ]
+            story.extend(section)
 
         except Exception as e:
             # Report the error to the console and in the PDF
-            story.append(Paragraph(f"Analysis Failed for {x_col}: {e}", styles['Normal'])) 
-            story.append(Spacer(1, 12))
+            story.extend([Paragraph(f"Analysis Failed for {x_col}: {e}", NORMAL_STYLE), Spacer(1, 12)])
             
     doc.build(story)
-    return pdf_filename
+    return pdf_buf.getvalue()
+
+# --- MEMOIZED ANALYSIS RUN ---
 
-def create_download_link(file_path, link_text):
-    """Create a download link for files"""
-    with open(file_path, "rb") as f:
-        data = f.read()
-    b64 = base64.b64encode(data).decode()
-    href = f'<a href="data:file/pdf;base64,{b64}" download="{file_path}" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-align: center; text-decoration: none; display: inline-block; border-radius: 5px;">{link_text}</a>'
-    return href
+@st.cache_data(max_entries=8, show_spinner=False)
+def run_analysis(arr, stds, valid, col_names, head_df, y_index):
+    """
+    Runs the whole analysis for one Y feature: correlations, per-feature result records and the PDF.
+    Memoized here in the main process on the data and Y, so reruns and repeated clicks skip all of it
+    (caches inside the pool workers would die with them). Returns (results, pdf_bytes).
+    """
+    y_feature = col_names[y_index]
+    x_indices = [col_names.index(x_col) for x_col in select_x_features(col_names, valid, y_feature)]
+    r_all = compute_correlations(arr, stds, valid, y_index)
+    
+    # Created in here so Streamlit can replay the (finished) bar on cache hits
+    progress_bar = st.progress(0)
+    results = analyze_features(arr, x_indices, y_index, r_all, col_names, head_df, on_progress=progress_bar.progress)
+    return results, generate_report(results, y_feature)
 
 def main():
     # Header
@@ -237,38 +543,46 @@ def main():
     
     # Sample data creation option
     if st.sidebar.checkbox("Use Sample Data", value=True):
-        if not pd.io.common.file_exists('sample_quantitative_data.csv'):
+        if not pd.io.common.file_exists('sample_quantitative_data.parquet'):
             st.sidebar.info("Creating sample dataset...")
             N = 100
-            np.random.seed(42)
-            load_time = np.random.normal(loc=3.5, scale=1.0, size=N)
-            load_time = np.clip(load_time, 1.5, 6.0)
+            rng = np.random.default_rng(42)
+            # One standard-normal draw feeds both the load times and the satisfaction noise
+            z = rng.standard_normal((N, 2))
+            load_time = np.clip(3.5 + z[:, 0], 1.5, 6.0)
 
             base_satisfaction = 90 - (load_time * 5)
-            satisfaction_score = base_satisfaction + np.random.normal(loc=0, scale=8, size=N)
-            satisfaction_score = np.clip(satisfaction_score, 50, 100).astype(int)
+            satisfaction_score = base_satisfaction + 8 * z[:, 1]
+            satisfaction_score = np.clip(satisfaction_score, 50, 100).astype(np.int16)
 
             data = pd.DataFrame({
                 'ObservationID': range(1, N + 1),
                 'LoadTime_s': load_time,
                 'SatisfactionScore_100': satisfaction_score,
                 'ConstantFeature': np.full(N, 10), # Will be filtered out due to low variability
-                'RandomNoise': np.random.rand(N) * 10 
+                'RandomNoise': rng.random(N) * 10
             })
-            data.to_csv('sample_quantitative_data.csv', index=False)
+            # Parquet keeps the column types and loads much faster than re-parsing a CSV on every rerun
+            data.to_parquet('sample_quantitative_data.parquet', index=False)
         
-        data_df = pd.read_csv('sample_quantitative_data.csv')
+        data_df = pd.read_parquet('sample_quantitative_data.parquet')
         data_df.dropna(inplace=True)
         st.sidebar.success("Sample data loaded successfully!")
         
     elif uploaded_file is not None:
-        data_df = pd.read_csv(uploaded_file)
+        # PyArrow parses on multiple threads and produces typed Arrow columns directly
+        data_df = pd.read_csv(uploaded_file, engine='pyarrow', dtype_backend='pyarrow')
         data_df.dropna(inplace=True)
         st.sidebar.success("Uploaded data loaded successfully!")
     else:
         st.info("Please upload a CSV file or use the sample data to begin analysis.")
         return
     
+    # Detect numeric columns and their spread once; reused by the metrics, the filters and the report
+    # bool is listed explicitly: np.number excludes it, but True/False columns are valid X/Y candidates
+    numeric_cols = data_df.select_dtypes(include=[np.number, 'bool']).columns.tolist()
+    arr, stds, valid = build_numeric_array(data_df, numeric_cols)
+    
     # Display dataset info
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -276,21 +590,31 @@ def main():
     with col2:
         st.metric("Total Columns", len(data_df.columns))
     with col3:
-        numeric_cols = len([col for col in data_df.columns if pd.api.types.is_numeric_dtype(data_df[col])])
-        st.metric("Numeric Columns", numeric_cols)
+        st.metric("Numeric Columns", len(numeric_cols))
     
     # Target variable selection
-    numeric_columns = [col for col in data_df.columns if pd.api.types.is_numeric_dtype(data_df[col])]
     y_feature = st.sidebar.selectbox(
         "Select Target Variable (Y)",
-        numeric_columns,
-        index=numeric_columns.index('SatisfactionScore_100') if 'SatisfactionScore_100' in numeric_columns else 0
+        numeric_cols,
+        index=numeric_cols.index('SatisfactionScore_100') if 'SatisfactionScore_100' in numeric_cols else 0
     )
     
     # Data preview
     st.markdown('<div class="section-header">📋 Data Preview</div>', unsafe_allow_html=True)
     st.dataframe(data_df.head(), use_container_width=True)
     
+    with st.expander("Full correlation matrix"):
+        corr_df = pd.DataFrame(compute_correlation_matrix(arr, stds, valid), index=numeric_cols, columns=numeric_cols)
+        
+        # Streamlit refuses Stylers above pandas' render limit; wide files get the plain matrix
+        if corr_df.size <= pd.get_option("styler.render.max_elements"):
+            st.dataframe(
+                corr_df.style.background_gradient(cmap='RdBu_r', vmin=-1, vmax=1).format("{:.4f}", na_rep="—"),
+                use_container_width=True
+            )
+        else:
+            st.dataframe(corr_df, use_container_width=True)
+    
     # Analysis section
     st.markdown('<div class="section-header">📊 Correlation Analysis</div>', unsafe_allow_html=True)
     
@@ -298,45 +622,27 @@ def main():
         with st.spinner("Performing correlation analysis and generating insights..."):
             
             # Get suitable features
-            all_numeric_cols = [col for col in data_df.columns if pd.api.types.is_numeric_dtype(data_df[col])]
-            x_features = []
-            
-            for col in all_numeric_cols:
-                if col == y_feature:
-                    continue
-                if col.lower() in ['id', 'observationid', 'rowid', 'index']:
-                    continue
-                if data_df[col].std() < 1e-6:
-                    continue
-                x_features.append(col)
+            x_features = select_x_features(numeric_cols, valid, y_feature)
             
             if not x_features:
                 st.error(f"No suitable numeric X features found to compare against {y_feature}.")
                 return
             
-            progress_bar = st.progress(0)
-            results = []
+            y_index = numeric_cols.index(y_feature)
+            head_df = data_df[numeric_cols].head(5)
             
-            for i, x_col in enumerate(x_features):
-                progress_bar.progress((i + 1) / len(x_features))
-                
-                small_table_df, r_value, plot_path, interpretation, strength, direction, r_sq = perform_analysis(data_df, x_col, y_feature)
-                
-                results.append({
-                    'feature': x_col,
-                    'correlation': r_value,
-                    'r_squared': r_sq,
-                    'strength': strength,
-                    'direction': direction,
-                    'interpretation': interpretation,
-                    'plot_path': plot_path,
-                    'sample_data': small_table_df
-                })
+            # One analysis pass feeds both the on-screen results and the PDF report
+            results, pdf_bytes = run_analysis(arr, stds, valid, numeric_cols, head_df, y_index)
             
             # Display results
             for i, result in enumerate(results):
                 st.markdown(f"### 🔍 Analysis: {result['feature']} vs {y_feature}")
                 
+                if 'error' in result:
+                    st.error(f"Analysis Failed for {result['feature']}: {result['error']}")
+                    st.markdown("---")
+                    continue
+                
                 # Create columns for metrics
                 col1, col2, col3, col4 = st.columns(4)
                 
@@ -369,21 +675,25 @@ def main():
                 
                 with col_right:
                     st.write("**Scatter Plot:**")
-                    st.image(result['plot_path'], use_container_width=True)
+                    st.image(result['plot_png'], use_container_width=True)
                 
                 st.markdown("---")
             
             # Generate PDF report
             st.markdown('<div class="section-header">📄 Report Generation</div>', unsafe_allow_html=True)
             
-            with st.spinner("Generating comprehensive PDF report..."):
-                pdf_filename = generate_report(data_df, y_feature)
-                
-                if pdf_filename:
-                    st.markdown('<div class="success-box">', unsafe_allow_html=True)
-                    st.success("✅ PDF report generated successfully!")
-                    st.markdown(create_download_link(pdf_filename, "📥 Download Comprehensive Report"), unsafe_allow_html=True)
-                    st.markdown('</div>', unsafe_allow_html=True)
+            # The PDF was built together with the results (see run_analysis)
+            if pdf_bytes:
+                st.markdown('<div class="success-box">', unsafe_allow_html=True)
+                st.success("✅ PDF report generated successfully!")
+                st.download_button(
+                    "📥 Download Comprehensive Report",
+                    data=pdf_bytes,
+                    file_name="Comprehensive_Scientific_Report.pdf",
+                    mime="application/pdf",
+                    on_click="ignore"  # a rerun would clear the results drawn under the Run button
+                )
+                st.markdown('</div>', unsafe_allow_html=True)
 
 if __name__ == '__main__':
 